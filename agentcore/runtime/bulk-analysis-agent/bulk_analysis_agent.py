@@ -3,104 +3,68 @@
 Bulk Analysis Agent - Analyzes grouped WAF events by source IP
 Provides comprehensive security assessment for multiple related events
 """
-import json
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import ChainMap, OrderedDict
+from typing import Any, Dict, List, Optional
+
+import orjson
 from bedrock_agentcore import BedrockAgentCoreApp
-from strands import Agent
 
-# Create the AgentCore application
-app = BedrockAgentCoreApp()
-
-# Create a Strands agent with Nova Micro model
-agent = Agent(model="amazon.nova-micro-v1:0")
-
-
-def extract_json_from_response(result_message):
-    """
-    Extract and parse JSON from Nova Lite's response
-
-    Args:
-        result_message: The message dict from Strands agent result
+# Nova Micro cross-region inference profile (or a provisioned-throughput / application inference profile ARN)
+NOVA_MODEL_ID = os.environ.get('NOVA_MODEL_ID', 'us.amazon.nova-micro-v1:0')
 
-    Returns:
-        dict: Parsed JSON analysis or error dict
-    """
-    try:
-        # Extract text content from message structure
-        if isinstance(result_message, dict) and 'content' in result_message:
-            text = result_message['content'][0]['text']
-        else:
-            text = str(result_message)
+# Prompt size limits (the counts in the summary always reflect the full lists)
+PROMPT_MAX_URIS = int(os.environ.get('PROMPT_MAX_URIS', '50'))
+PROMPT_MAX_RULES = 5
 
-        # Remove markdown code blocks if present
-        if '```json' in text:
-            text = text.split('```json')[1].split('```')[0].strip()
-        elif '```' in text:
-            text = text.split('```')[1].split('```')[0].strip()
+# Fields every analysis must contain (rating_reason and attack_type are optional)
+REQUIRED_FIELDS = frozenset({'severity_rating', 'security_analysis', 'recommended_actions'})
 
-        # Parse JSON
-        analysis = json.loads(text)
+# Analysis cache configuration
+ANALYSIS_CACHE_TTL = int(os.environ.get('ANALYSIS_CACHE_TTL', '3600'))
+ANALYSIS_CACHE_SIZE = int(os.environ.get('ANALYSIS_CACHE_SIZE', '1024'))
 
-        # Validate required fields (rating_reason is optional for backward compatibility)
-        required_fields = ['severity_rating', 'security_analysis', 'recommended_actions']
-        for field in required_fields:
-            if field not in analysis:
-                return {"error": f"Missing required field: {field}", "raw_response": text[:200]}
+# Create the AgentCore application
+app = BedrockAgentCoreApp()
 
-        # Validate severity rating
-        severity = analysis['severity_rating']
-        if not isinstance(severity, int) or severity < 0 or severity > 5:
-            return {"error": f"Invalid severity rating: {severity}", "raw_response": text[:200]}
 
-        return analysis
+@functools.lru_cache(maxsize=None)
+def _get_model():
+    """Shared Nova Micro model (strands is imported on first use to keep cold start short)."""
+    from strands.models import BedrockModel
 
-    except Exception as e:
-        return {"error": f"JSON parsing failed: {str(e)}", "raw_response": str(result_message)[:200]}
+    return BedrockModel(model_id=NOVA_MODEL_ID)
 
 
-@app.entrypoint
-def invoke(payload):
+def _new_agent():
     """
-    Main entrypoint for the Bulk Analysis Agent.
+    Fresh Strands agent per analysis with the static instructions as its
+    system prompt, so no conversation history carries over between calls.
+    """
+    from strands import Agent
 
-    Args:
-        payload: Input payload containing:
-            - summary: Aggregated statistics (IP, country, event count, time range, unique URIs/rules, breakdowns)
-            - events: Array of key event information (timestamp, action, rule, uri, method, user_agent, host)
+    return Agent(model=_get_model(), system_prompt=STATIC_INSTRUCTIONS)
 
-    Returns:
-        dict: Response with bulk security analysis
-    """
-    # Extract summary and events
-    summary = payload.get('summary', {})
-    events = payload.get('events', [])
 
-    # Build bulk analysis prompt
-    unique_uri_count = len(summary.get('unique_uris', []))
-    prompt = f"""You are a cybersecurity expert analyzing a group of WAF (Web Application Firewall) events from the same source IP.
+def _dumps(obj: Any, indent: bool = False, sort_keys: bool = False) -> str:
+    """Serialize to a JSON string with orjson."""
+    option = (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return orjson.dumps(obj, default=str, option=option).decode()
 
-**AGGREGATED SUMMARY:**
-- Source IP: {summary.get('source_ip', 'N/A')}
-- Country: {summary.get('country', 'Unknown')}
-- Total Events: {summary.get('total_events', 0)}
-- Time Range: {summary.get('time_range', {}).get('first', 'N/A')} to {summary.get('time_range', {}).get('last', 'N/A')} ({summary.get('time_range', {}).get('duration_minutes', 0)} minutes)
-- **UNIQUE URIs ACCESSED: {unique_uri_count}** (IMPORTANT: This IP accessed {unique_uri_count} DIFFERENT URIs)
-  All URIs: {', '.join(summary.get('unique_uris', []))}
-- Rules Triggered: {len(summary.get('unique_rules', []))}
-  Rules: {', '.join(summary.get('unique_rules', [])[:5])}
-- Action Breakdown: {json.dumps(summary.get('action_breakdown', {}))}
-- HTTP Method Breakdown: {json.dumps(summary.get('method_breakdown', {}))}
 
-**REPRESENTATIVE EVENTS** (showing first 10 of {len(events)}):
-"""
+_loads = orjson.loads
 
-    # Add sample events for context (first 10)
-    for i, event in enumerate(events[:10], 1):
-        prompt += f"\n{i}. [{event.get('timestamp', 'N/A')}] {event.get('action', 'N/A')} - {event.get('rule_name', 'N/A')} - {event.get('http_method', 'N/A')} {event.get('uri', 'N/A')}"
 
-    if len(events) > 10:
-        prompt += f"\n... and {len(events) - 10} more events with similar patterns"
+# Marks where the per-request data begins; everything before it is static
+DATA_SENTINEL = "---DATA---"
 
-    prompt += """
+# Static instructions, sent as the agent system prompt ahead of the per-request data
+STATIC_INSTRUCTIONS = """You are a cybersecurity expert analyzing a group of WAF (Web Application Firewall) events from the same source IP.
+The aggregated summary and representative events follow the ---DATA--- marker.
 
 **INSTRUCTIONS:**
 Analyze these grouped events as a whole to identify:
@@ -121,7 +85,7 @@ Please respond in JSON format with:
 - Look for patterns: Same URIs, rules, methods indicate purposeful activity
 
 **CRITICAL: Directory Scanning Severity Rules:**
-- CHECK THE "UNIQUE URIs ACCESSED" NUMBER ABOVE
+- CHECK THE "UNIQUE URIs ACCESSED" NUMBER IN THE DATA SECTION
 - If UNIQUE URIs >= 10 with WordPress/admin/system paths → YOU MUST rate severity 4 or 5
 - Directory scanning is ALWAYS high severity whether BLOCKED or ALLOWED
 - ALLOWED scanning is MORE dangerous (successful reconnaissance)
@@ -135,19 +99,279 @@ Please respond in JSON format with:
 - Single blocked request = lower severity than repeated attempts
 
 Example format:
-{{
+{
   "severity_rating": 4,
   "attack_type": "SQL Injection Attempt",
   "rating_reason": "47 automated SQL injection attempts in 12 minutes indicates active attack campaign. so, the rating is 4.",
   "security_analysis": "This IP made 47 attempts to inject SQL commands into the login form over 12 minutes. All requests were blocked by rule 'SQLi-BODY'. Pattern indicates automated scanning tool.",
   "recommended_actions": "Block this IP at firewall level and monitor for similar activity from other IPs in the same subnet."
-}}"""
+}
+"""
+
+
+class AnalysisCache:
+    """
+    In-process exact-key TTL/LRU cache of validated analyses. Callers key
+    it on a canonical signature of the pattern rather than on the rendered
+    prompt; entries expire after ttl seconds and the least recently used
+    entry is evicted once maxsize is reached.
+    """
+
+    def __init__(self, maxsize: int = ANALYSIS_CACHE_SIZE, ttl: int = ANALYSIS_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(value)
+
+    def set(self, key: str, value: Dict, ttl: Optional[int] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+analysis_cache = AnalysisCache()
+prompt_cache = AnalysisCache()
+
+# Per-request data section; filled from the summary with format_map
+SUMMARY_TEMPLATE = DATA_SENTINEL + """
+**AGGREGATED SUMMARY:**
+- Source IP: {source_ip}
+- Country: {country}
+- Total Events: {total_events}
+- Time Range: {first} to {last} ({duration_minutes} minutes)
+- **UNIQUE URIs ACCESSED: {unique_uri_count}** (IMPORTANT: This IP accessed {unique_uri_count} DIFFERENT URIs)
+  All URIs: {uri_list}
+- Rules Triggered: {rule_count}
+  Rules: {rule_list}
+- Action Breakdown: {action_breakdown}
+- HTTP Method Breakdown: {method_breakdown}
+
+**REPRESENTATIVE EVENTS** (showing first 10 of {event_count}):
+"""
+
+# Fallbacks for summary fields missing from the payload
+SUMMARY_DEFAULTS = {
+    'source_ip': 'N/A',
+    'country': 'Unknown',
+    'total_events': 0,
+    'first': 'N/A',
+    'last': 'N/A',
+    'duration_minutes': 0
+}
+
+
+class AnalysisError(Exception):
+    """Raised when the model response fails validation (never cached)."""
+
+    def __init__(self, result):
+        super().__init__(result.get('error'))
+        self.result = result
+
+
+def prompt_hash(prompt: str) -> str:
+    """Exact-match cache key for a rendered prompt."""
+    return hashlib.blake2b(prompt.encode(), digest_size=16).hexdigest()
 
-    # Process through Strands agent (calls Nova Lite)
-    result = agent(prompt)
 
-    # Parse the JSON analysis from the response
+def analyze_prompt(prompt: str) -> Dict[str, Any]:
+    """
+    Invoke the agent once per distinct prompt within the cache TTL.
+    Invalid analyses raise AnalysisError and are never cached.
+    """
+    key = prompt_hash(prompt)
+    cached = prompt_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = _new_agent()(prompt)
     analysis = extract_json_from_response(result.message)
+    if 'error' in analysis:
+        raise AnalysisError(analysis)
+
+    prompt_cache.set(key, analysis)
+    return analysis
+
+
+def summary_signature(summary: Dict[str, Any]) -> str:
+    """
+    Build the cache key for a grouped-event summary.
+
+    Only the fields that characterise the attacker pattern are used
+    (country, action breakdown, rules and URIs), so a re-analysis of the
+    same pattern minutes later maps onto the same key.
+    """
+    features = (
+        summary.get('country'),
+        sorted(summary.get('action_breakdown', {}).items()),
+        sorted(summary.get('unique_rules', [])),
+        sorted(summary.get('unique_uris', [])),
+    )
+    canonical = _dumps(features)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def _truncate_list(items: List[str], limit: int = 50) -> List[str]:
+    """Cap a list for the prompt, noting how many items were left out."""
+    if len(items) <= limit:
+        return items
+    return items[:limit] + [f'...(+{len(items) - limit} more)']
+
+
+def _strip_code_fence(text: str) -> str:
+    """
+    Return the body of the first markdown code block (```json or bare ```)
+    in a single partition pass, or the stripped text if there is none.
+    """
+    text = text.strip()
+    _, fence, rest = text.partition('```')
+    if not fence:
+        return text
+    body = rest.partition('```')[0]
+    if body.startswith('json'):
+        body = body[4:]
+    return body.strip()
+
+
+def _coerce_severity(value: Any) -> Optional[int]:
+    """
+    Return the severity as an int in 0-5, accepting numeric strings such
+    as "4" and integral floats such as 4.0 from the model; None if it
+    cannot be used (fractional ratings are rejected, not truncated).
+    """
+    if type(value) is not int:
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, float) and not value.is_integer():
+            return None
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return None
+    return value if 0 <= value <= 5 else None
+
+
+def extract_json_from_response(result_message: Any) -> Dict[str, Any]:
+    """
+    Extract and parse JSON from Nova Lite's response
+
+    Args:
+        result_message: The message dict from Strands agent result
+
+    Returns:
+        dict: Parsed JSON analysis or error dict
+    """
+    try:
+        # Extract text content from message structure
+        if isinstance(result_message, dict) and 'content' in result_message:
+            text = result_message['content'][0]['text']
+        else:
+            text = str(result_message)
+
+        # Remove markdown code blocks if present
+        text = _strip_code_fence(text)
+
+        # Parse JSON
+        analysis = _loads(text)
+
+        # Validate required fields (rating_reason is optional for backward compatibility)
+        missing = REQUIRED_FIELDS - analysis.keys()
+        if missing:
+            return {"error": f"Missing required field: {', '.join(sorted(missing))}", "raw_response": text[:200]}
+
+        # Validate severity rating
+        severity = _coerce_severity(analysis['severity_rating'])
+        if severity is None:
+            return {"error": f"Invalid severity rating: {analysis['severity_rating']}", "raw_response": text[:200]}
+        analysis['severity_rating'] = severity
+
+        return analysis
+
+    except Exception as e:
+        return {"error": f"JSON parsing failed: {str(e)}", "raw_response": str(result_message)[:200]}
+
+
+def build_data_section(summary: Dict[str, Any], events: List[Dict[str, Any]]) -> str:
+    """
+    Render the per-request data section of the bulk analysis prompt
+    (aggregated summary plus the first 10 representative events).
+    """
+    unique_uris = summary.get('unique_uris', [])
+    unique_rules = summary.get('unique_rules', [])
+    header = SUMMARY_TEMPLATE.format_map(ChainMap(
+        {
+            'unique_uri_count': len(unique_uris),
+            'uri_list': ', '.join(_truncate_list(unique_uris, PROMPT_MAX_URIS)),
+            'rule_count': len(unique_rules),
+            'rule_list': ', '.join(_truncate_list(unique_rules, PROMPT_MAX_RULES)),
+            'action_breakdown': _dumps(summary.get('action_breakdown', {})),
+            'method_breakdown': _dumps(summary.get('method_breakdown', {})),
+            'event_count': len(events)
+        },
+        summary.get('time_range', {}),
+        summary,
+        SUMMARY_DEFAULTS
+    ))
+
+    # Add sample events for context (first 10)
+    event_lines = [
+        f"{i}. [{event.get('timestamp', 'N/A')}] {event.get('action', 'N/A')} - {event.get('rule_name', 'N/A')} - {event.get('http_method', 'N/A')} {event.get('uri', 'N/A')}"
+        for i, event in enumerate(events[:10], 1)
+    ]
+
+    if len(events) > 10:
+        event_lines.append(f"... and {len(events) - 10} more events with similar patterns")
+
+    return "\n".join([header, *event_lines])
+
+
+@app.entrypoint
+def invoke(payload):
+    """
+    Main entrypoint for the Bulk Analysis Agent.
+
+    Args:
+        payload: Input payload containing:
+            - summary: Aggregated statistics (IP, country, event count, time range, unique URIs/rules, breakdowns)
+            - events: Array of key event information (timestamp, action, rule, uri, method, user_agent, host)
+
+    Returns:
+        dict: Response with bulk security analysis
+    """
+    # Extract summary and events
+    summary = payload.get('summary', {})
+    events = payload.get('events', [])
+
+    # Same attacker pattern analyzed recently - skip the Bedrock round-trip
+    cache_key = summary_signature(summary)
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Build the per-request data section (the static instructions are the system prompt)
+    prompt = build_data_section(summary, events)
+
+    # Process through Strands agent (calls Nova Lite) unless this exact data was already analyzed
+    try:
+        analysis = analyze_prompt(prompt)
+    except AnalysisError as e:
+        return e.result
+
+    analysis_cache.set(cache_key, analysis)
 
     # Return parsed analysis
     return analysis
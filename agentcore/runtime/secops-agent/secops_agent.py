@@ -4,15 +4,23 @@ SecOps Agent - Multi-Agent Security Operations Center
 Uses Strands SDK with 3 logical agents: Security Analyst, Triage, and Monitoring
 """
 
-import json
+import functools
+import hashlib
 import logging
 import os
-from typing import Any, Dict, List
-from datetime import datetime
-
+import re
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+
+import orjson
 from bedrock_agentcore import BedrockAgentCoreApp
-from strands import Agent, tool
-import requests
+
+# strands, requests and boto3 are imported on first use to keep cold start short
 
 # Initialize logging
 logging.basicConfig(
@@ -24,15 +32,147 @@ logger = logging.getLogger(__name__)
 # Backend API configuration
 BACKEND_API_URL = os.environ.get('BACKEND_API_URL', 'https://aws1.c6web.com/api')
 API_TIMEOUT = 30
+BACKEND_WORKERS = 16  # Concurrent backend writes in the batch/monitor workflows
+
+# Code-based campaign detection: same source IP + terminating WAF rule on
+# blocked/challenged requests, at least CAMPAIGN_MIN_EVENTS events with no
+# gap longer than CAMPAIGN_WINDOW_MINUTES
+CAMPAIGN_MIN_EVENTS = int(os.environ.get('CAMPAIGN_MIN_EVENTS', '5'))
+CAMPAIGN_WINDOW_MINUTES = int(os.environ.get('CAMPAIGN_WINDOW_MINUTES', '60'))
+CAMPAIGN_ACTIONS = ('BLOCK', 'CAPTCHA', 'CHALLENGE')
+DEFAULT_ACTION_RULE_ID = 'Default_Action'
+
+# Source IPs with fewer events are not sent to the Monitoring Agent
+MONITORING_MIN_IP_EVENTS = 3
+
+# Nova Micro cross-region inference profile (or a provisioned-throughput / application inference profile ARN)
+NOVA_MODEL_ID = os.environ.get('NOVA_MODEL_ID', 'us.amazon.nova-micro-v1:0')
+
+# Analysis cache configuration
+ANALYSIS_CACHE_TTL = int(os.environ.get('ANALYSIS_CACHE_TTL', '3600'))
+ANALYSIS_CACHE_SIZE = int(os.environ.get('ANALYSIS_CACHE_SIZE', '1024'))
+
+# Stop streaming the security analysis as soon as a low severity (0-2) is known
+STREAM_EARLY_EXIT = os.environ.get('STREAM_EARLY_EXIT', 'true').lower() == 'true'
+EARLY_EXIT_MAX_SEVERITY = 2
+
+# Bedrock batch inference configuration (analyze many events in one job)
+BATCH_S3_BUCKET = os.environ.get('BATCH_S3_BUCKET', '')
+BATCH_S3_PREFIX = os.environ.get('BATCH_S3_PREFIX', 'secops-batch')
+BATCH_ROLE_ARN = os.environ.get('BATCH_ROLE_ARN', '')
+BATCH_MIN_EVENTS = int(os.environ.get('BATCH_MIN_EVENTS', '100'))  # Bedrock minimum records per job
+BATCH_TERMINAL_STATES = ('Completed', 'PartiallyCompleted', 'Failed', 'Stopped', 'Expired')
+
+# Event fields that characterise an attacker pattern (ids/timestamps excluded)
+EVENT_SIGNATURE_FIELDS = (
+    'source_ip', 'country', 'action', 'rule_id', 'rule_name',
+    'http_method', 'uri', 'host', 'user_agent'
+)
 
 # Create the AgentCore application
 app = BedrockAgentCoreApp()
 
+
+def _dumps(obj: Any, indent: bool = False, sort_keys: bool = False) -> str:
+    """Serialize to a JSON string with orjson."""
+    option = (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return orjson.dumps(obj, default=str, option=option).decode()
+
+
+_loads = orjson.loads
+
+
+@functools.lru_cache(maxsize=None)
+def _get_session():
+    """
+    Shared keep-alive HTTP session so backend calls reuse pooled TCP/TLS
+    connections. Retries only apply to idempotent methods (GET/PUT), never
+    to escalation POSTs.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504))
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _iso_now_utc() -> str:
+    """Current UTC time as ISO-8601 with microseconds, e.g. 2025-10-13T12:00:00.123456Z."""
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    return f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))}.{nanos // 1000:06d}Z"
+
+
+@functools.lru_cache(maxsize=None)
+def _aws_client(service_name: str):
+    """Shared boto3 client per service (created on first use)."""
+    import boto3
+    return boto3.client(service_name)
+
+
+# ============================================================================
+# ANALYSIS CACHE
+# ============================================================================
+
+class AnalysisCache:
+    """
+    In-process exact-key TTL/LRU cache of validated analyses. Callers key
+    it on a canonical signature of the pattern rather than on the rendered
+    prompt; entries expire after ttl seconds and the least recently used
+    entry is evicted once maxsize is reached.
+    """
+
+    def __init__(self, maxsize: int = ANALYSIS_CACHE_SIZE, ttl: int = ANALYSIS_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(value)
+
+    def set(self, key: str, value: Dict, ttl: Optional[int] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+analysis_cache = AnalysisCache()
+
+
+def event_signature(event: Dict) -> str:
+    """
+    Build the cache key for a single WAF event from its pattern fields,
+    so repeated hits from the same attacker/rule/URI share one analysis.
+    """
+    features = [(field, event.get(field)) for field in EVENT_SIGNATURE_FIELDS]
+    canonical = _dumps(features)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
 # ============================================================================
 # TOOLS - Backend API Integration
+# (registered as Strands tools on the Monitoring Agent in _new_monitoring_agent)
 # ============================================================================
 
-@tool
 def update_event_analysis(event_id: int, severity: int, analysis: str,
                           recommendations: str, status: str) -> str:
     """
@@ -55,12 +195,12 @@ def update_event_analysis(event_id: int, severity: int, analysis: str,
             "ai_analysis": analysis,
             "follow_up_suggestion": recommendations,
             "status": status,
-            "analyzed_at": datetime.utcnow().isoformat(),
+            "analyzed_at": _iso_now_utc(),
             "analyzed_by": "secops-agent"
         }
 
         logger.info(f"Updating event {event_id} via API: {url}")
-        response = requests.put(url, json=payload, timeout=API_TIMEOUT)
+        response = _get_session().put(url, json=payload, timeout=API_TIMEOUT)
         response.raise_for_status()
 
         return f"Successfully updated event {event_id}"
@@ -70,7 +210,6 @@ def update_event_analysis(event_id: int, severity: int, analysis: str,
         return error_msg
 
 
-@tool
 def bulk_update_events(event_ids: List[int], severity: int, analysis: str,
                       recommendations: str, status: str) -> str:
     """
@@ -94,12 +233,12 @@ def bulk_update_events(event_ids: List[int], severity: int, analysis: str,
             "ai_analysis": analysis,
             "follow_up_suggestion": recommendations,
             "status": status,
-            "analyzed_at": datetime.utcnow().isoformat(),
+            "analyzed_at": _iso_now_utc(),
             "analyzed_by": "secops-agent-monitoring"
         }
 
         logger.info(f"Bulk updating {len(event_ids)} events via API: {url}")
-        response = requests.post(url, json=payload, timeout=API_TIMEOUT)
+        response = _get_session().post(url, json=payload, timeout=API_TIMEOUT)
         response.raise_for_status()
 
         return f"Successfully updated {len(event_ids)} events"
@@ -109,7 +248,6 @@ def bulk_update_events(event_ids: List[int], severity: int, analysis: str,
         return error_msg
 
 
-@tool
 def create_escalation(event_id: int, severity: int, title: str,
                      message: str, detail_payload: Dict) -> str:
     """
@@ -137,7 +275,7 @@ def create_escalation(event_id: int, severity: int, title: str,
         }
 
         logger.info(f"Creating escalation for event {event_id} via API: {url}")
-        response = requests.post(url, json=payload, timeout=API_TIMEOUT)
+        response = _get_session().post(url, json=payload, timeout=API_TIMEOUT)
         response.raise_for_status()
 
         result = response.json()
@@ -150,7 +288,6 @@ def create_escalation(event_id: int, severity: int, title: str,
         return error_msg
 
 
-@tool
 def create_campaign_escalation(title: str, message: str, severity: int,
                                affected_event_ids: List[int], detail_payload: Dict) -> str:
     """
@@ -184,7 +321,7 @@ def create_campaign_escalation(title: str, message: str, severity: int,
         }
 
         logger.info(f"Creating campaign escalation for {len(affected_event_ids)} events via API: {url}")
-        response = requests.post(url, json=payload, timeout=API_TIMEOUT)
+        response = _get_session().post(url, json=payload, timeout=API_TIMEOUT)
         response.raise_for_status()
 
         result = response.json()
@@ -197,7 +334,29 @@ def create_campaign_escalation(title: str, message: str, severity: int,
         return error_msg
 
 
-@tool
+def _get_open_events_raw(hours: int = 24) -> List[Dict]:
+    """
+    Fetch all open WAF events as a list (for direct Python callers).
+    Raises on request failure.
+    """
+    url = f"{BACKEND_API_URL}/events"
+    params = {
+        "status": "open",
+        "hours": hours,
+        "limit": 500  # Get up to 500 open events
+    }
+
+    logger.info(f"Fetching open events from last {hours} hours via API: {url}")
+    response = _get_session().get(url, params=params, timeout=API_TIMEOUT)
+    response.raise_for_status()
+
+    result = response.json()
+    events = result.get('events', [])
+
+    logger.info(f"Retrieved {len(events)} open events")
+    return events
+
+
 def get_open_events(hours: int = 24) -> str:
     """
     Fetch all open WAF events for monitoring analysis.
@@ -209,45 +368,194 @@ def get_open_events(hours: int = 24) -> str:
         JSON string of open events or error message
     """
     try:
-        url = f"{BACKEND_API_URL}/events"
-        params = {
-            "status": "open",
-            "hours": hours,
-            "limit": 500  # Get up to 500 open events
-        }
-
-        logger.info(f"Fetching open events from last {hours} hours via API: {url}")
-        response = requests.get(url, params=params, timeout=API_TIMEOUT)
-        response.raise_for_status()
-
-        result = response.json()
-        events = result.get('events', [])
-
-        logger.info(f"Retrieved {len(events)} open events")
-        return json.dumps(events)
+        return _dumps(_get_open_events_raw(hours))
     except Exception as e:
         error_msg = f"Failed to fetch open events: {str(e)}"
         logger.error(error_msg)
-        return json.dumps({"error": error_msg})
+        return _dumps({"error": error_msg})
+
+
+# ============================================================================
+# PROMPTS - static instructions go in the system prompt, per-request data in the user turn
+# ============================================================================
+
+# Marks where the per-request data begins; everything before it is static
+DATA_SENTINEL = "---DATA---"
+
+ANALYSIS_INSTRUCTIONS = """You are a cybersecurity analyst. Analyze the WAF event that follows the ---DATA--- marker and provide:
+1. severity_rating (0-5 integer)
+2. security_analysis (detailed threat analysis)
+3. recommended_actions (actionable recommendations)
+4. attack_type (classification)
+
+Severity scale:
+- 0: Not an issue
+- 1: Informational
+- 2: Low severity
+- 3: Medium severity (requires monitoring)
+- 4: High severity (requires escalation)
+- 5: Critical incident (requires immediate escalation)
+
+Return ONLY valid JSON with this structure, keeping the fields in this order:
+{
+  "severity_rating": <0-5>,
+  "attack_type": "<type>",
+  "security_analysis": "<analysis>",
+  "recommended_actions": "<actions>"
+}
+"""
+
+MONITORING_INSTRUCTIONS = """You are a security monitoring specialist. The data after the ---DATA--- marker summarizes open WAF events per source IP, to detect attack campaigns.
+
+Each source IP entry contains:
+- source_ip, event_count, first_seen, last_seen
+- rule_counts / action_counts (events per WAF rule and per action)
+- uri_sample (up to 5 URIs) and sample_event_ids (up to 20 event IDs)
+
+Your task:
+1. Group source IPs by attack patterns (same attack type, similar timeframe)
+2. Identify coordinated attacks
+3. For each campaign, provide:
+   - campaign_id (unique identifier like "sqli_192.168.1.100")
+   - attack_type (e.g., "SQL Injection", "XSS", "DDoS")
+   - source_ips (list of source IPs in this campaign; all of their events are included automatically)
+   - severity_rating (4 or 5 for repeated attacks)
+   - security_analysis (describe the campaign)
+   - recommended_actions (actionable steps)
+
+IMPORTANT: Only create campaigns for genuine repeated attacks. If the activity is unrelated, return empty campaigns list.
+
+Return ONLY valid JSON:
+{
+  "campaigns": [
+    {
+      "campaign_id": "<unique_id>",
+      "attack_type": "<type>",
+      "source_ips": ["192.168.1.100"],
+      "severity_rating": <4 or 5>,
+      "security_analysis": "<analysis>",
+      "recommended_actions": "<actions>"
+    }
+  ]
+}
+"""
+
+
+def build_analysis_data(event_json: str) -> str:
+    """Data section of the single-event analysis prompt."""
+    return f"""{DATA_SENTINEL}
+Event Data:
+{event_json}"""
 
 
 # ============================================================================
 # LOGICAL AGENTS
 # ============================================================================
 
-# Security Analyst Agent - AI-powered threat analysis
-security_agent = Agent(model="amazon.nova-micro-v1:0")
+# Security Analyst Agent - AI-powered threat analysis, streamed through the
+# Converse API so triage can start before the full response is generated
+SEVERITY_FIELD = re.compile(r'"severity_rating"\s*:\s*"?(\d+)"?\s*[,}\n]')
+ATTACK_TYPE_FIELD = re.compile(r'"attack_type"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def stream_security_analysis(data: str) -> Dict[str, Any]:
+    """
+    Stream the Security Analyst response and parse it incrementally.
+
+    Once severity_rating is known and <= EARLY_EXIT_MAX_SEVERITY the stream
+    is closed (after attack_type, if the model emits it next) and a
+    short-form analysis is returned; higher severities are read to the end
+    so security_analysis and recommended_actions are available.
+    """
+    response = _aws_client('bedrock-runtime').converse_stream(
+        modelId=NOVA_MODEL_ID,
+        system=[{"text": ANALYSIS_INSTRUCTIONS}],
+        messages=[{"role": "user", "content": [{"text": data}]}]
+    )
+    stream = response['stream']
+    chunks: List[str] = []
+    scanning = STREAM_EARLY_EXIT
+    severity: Optional[int] = None
+
+    try:
+        for stream_event in stream:
+            text = stream_event.get('contentBlockDelta', {}).get('delta', {}).get('text')
+            if not text:
+                continue
+            chunks.append(text)
+            if not scanning:
+                continue
+
+            buffer = ''.join(chunks)
+            if severity is None:
+                match = SEVERITY_FIELD.search(buffer)
+                if not match:
+                    continue
+                severity = int(match.group(1))
+                if severity > EARLY_EXIT_MAX_SEVERITY:
+                    scanning = False
+                    continue
+
+            attack_type = ATTACK_TYPE_FIELD.search(buffer)
+            if attack_type or '"security_analysis"' in buffer:
+                logger.info(f"Severity {severity} known early - closing analysis stream")
+                return {
+                    "severity_rating": severity,
+                    "attack_type": _loads(f'"{attack_type.group(1)}"') if attack_type else "Low Severity Activity",
+                    "security_analysis": f"Rated severity {severity}; detailed analysis skipped for low-severity event.",
+                    "recommended_actions": "No action required (auto-closed).",
+                    "early_exit": True
+                }
+    finally:
+        stream.close()
+
+    return parse_json_response(''.join(chunks))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_monitoring_model_and_tools() -> Tuple[Any, Tuple[Any, ...]]:
+    """Shared Nova Micro model and backend tools for the Monitoring Agent."""
+    from strands import tool
+    from strands.models import BedrockModel
+
+    tools = (tool(get_open_events), tool(bulk_update_events), tool(create_campaign_escalation))
+    return BedrockModel(model_id=NOVA_MODEL_ID), tools
+
+
+def _new_monitoring_agent():
+    """
+    Monitoring Agent - AI-powered pattern detection for repeated attacks.
+    Built per run with the instructions as its system prompt, so no
+    conversation history carries over between monitor invocations.
+    """
+    from strands import Agent
+
+    model, tools = _get_monitoring_model_and_tools()
+    return Agent(model=model, system_prompt=MONITORING_INSTRUCTIONS, tools=list(tools))
 
-# Monitoring Agent - AI-powered pattern detection for repeated attacks
-monitoring_agent = Agent(
-    model="amazon.nova-micro-v1:0",
-    tools=[get_open_events, bulk_update_events, create_campaign_escalation]
-)
 
 # ============================================================================
 # TRIAGE LOGIC (CODE-BASED, NOT AI)
 # ============================================================================
 
+def _coerce_severity(value: Any) -> Optional[int]:
+    """
+    Return the severity as an int in 0-5, accepting numeric strings such
+    as "4" and integral floats such as 4.0 from the model; None if it
+    cannot be used (fractional ratings are rejected, not truncated).
+    """
+    if type(value) is not int:
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, float) and not value.is_integer():
+            return None
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return None
+    return value if 0 <= value <= 5 else None
+
+
 def triage_decision(severity_rating: int) -> Dict[str, Any]:
     """
     Code-based triage logic for routing events based on severity.
@@ -283,6 +591,123 @@ def triage_decision(severity_rating: int) -> Dict[str, Any]:
         }
 
 
+# ============================================================================
+# PATTERN DETECTION (CODE-BASED, NOT AI)
+# ============================================================================
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse an ISO-8601 event timestamp as UTC; None if missing or malformed."""
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _precluster_events(events: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Deterministically group clear-cut campaigns before involving the LLM.
+
+    Only events a WAF rule actually blocked or challenged (CAMPAIGN_ACTIONS,
+    excluding the web ACL default action) are considered; allowed traffic
+    is left for the Monitoring Agent. They are grouped by (source_ip,
+    rule_id) and split into bursts wherever consecutive events are more
+    than CAMPAIGN_WINDOW_MINUTES apart. Every burst of at least
+    CAMPAIGN_MIN_EVENTS becomes a campaign.
+
+    Returns:
+        (campaigns, remaining_events) - remaining events still need AI review
+    """
+    groups = defaultdict(list)
+    remaining = []
+    for event in events:
+        rule_id = event.get('rule_id')
+        if (event.get('action') not in CAMPAIGN_ACTIONS or not rule_id or rule_id == DEFAULT_ACTION_RULE_ID
+                or not event.get('source_ip') or event.get('id') is None):
+            remaining.append(event)
+            continue
+        timestamp = _parse_timestamp(event.get('timestamp'))
+        if timestamp:
+            groups[(event['source_ip'], rule_id)].append((timestamp, event))
+        else:
+            remaining.append(event)
+
+    window = timedelta(minutes=CAMPAIGN_WINDOW_MINUTES)
+    campaigns = []
+    for (source_ip, rule_id), members in groups.items():
+        members.sort(key=lambda member: member[0])
+
+        bursts = [[members[0]]]
+        for member in members[1:]:
+            if member[0] - bursts[-1][-1][0] > window:
+                bursts.append([])
+            bursts[-1].append(member)
+
+        for burst in bursts:
+            burst_events = [event for _, event in burst]
+            if len(burst_events) < CAMPAIGN_MIN_EVENTS:
+                remaining.extend(burst_events)
+                continue
+
+            first_seen = burst[0][0].isoformat()
+            last_seen = burst[-1][0].isoformat()
+            campaigns.append({
+                "campaign_id": f"{rule_id}_{source_ip}_{int(burst[0][0].timestamp())}",
+                "attack_type": rule_id,
+                "affected_event_ids": [event['id'] for event in burst_events],
+                "severity_rating": 4,
+                "security_analysis": (
+                    f"{len(burst_events)} blocked or challenged requests from {source_ip} terminated on WAF rule "
+                    f"'{rule_id}' between {first_seen} and {last_seen}, indicating a repeated attack."
+                ),
+                "recommended_actions": f"Review the activity from {source_ip} and consider adding it to the WAF blocklist.",
+                "detection": "code"
+            })
+
+    return campaigns, remaining
+
+
+def _aggregate_for_monitoring(events: List[Dict]) -> Tuple[List[Dict], Dict[str, List[int]]]:
+    """
+    Summarize events per source IP for the Monitoring Agent prompt.
+    IPs with fewer than MONITORING_MIN_IP_EVENTS events can never form a
+    campaign and are left out.
+
+    Returns:
+        (per-IP summaries, all event IDs per included source IP)
+    """
+    groups = defaultdict(list)
+    for event in events:
+        if event.get('source_ip') and event.get('id') is not None:
+            groups[event['source_ip']].append(event)
+
+    summaries = []
+    event_ids_by_ip = {}
+    for source_ip, ip_events in groups.items():
+        if len(ip_events) < MONITORING_MIN_IP_EVENTS:
+            continue
+
+        event_ids = [event['id'] for event in ip_events]
+        timestamps = [str(event['timestamp']) for event in ip_events if event.get('timestamp')]
+        uris = list(dict.fromkeys(event['uri'] for event in ip_events if event.get('uri')))
+
+        event_ids_by_ip[source_ip] = event_ids
+        summaries.append({
+            "source_ip": source_ip,
+            "event_count": len(ip_events),
+            "rule_counts": dict(Counter(event.get('rule_id') or 'N/A' for event in ip_events)),
+            "action_counts": dict(Counter(event.get('action') or 'N/A' for event in ip_events)),
+            "uri_sample": uris[:5],
+            "sample_event_ids": event_ids[:20],
+            "first_seen": min(timestamps, default=None),
+            "last_seen": max(timestamps, default=None)
+        })
+
+    return summaries, event_ids_by_ip
+
+
 # ============================================================================
 # ENTRYPOINT - Main Orchestration Logic
 # ============================================================================
@@ -291,18 +716,20 @@ def triage_decision(severity_rating: int) -> Dict[str, Any]:
 def invoke(payload: Dict, context: Any = None) -> Dict:
     """
     Main entrypoint for AgentCore SecOps Agent.
-    Supports two workflows: analyze (individual) and monitor (bulk patterns).
+    Supports four workflows: analyze (individual), batch_analyze (submit
+    many individual events as a Bedrock batch inference job), batch_collect
+    (apply a finished job's results) and monitor (bulk patterns).
     """
     logger.info("SecOps Agent invoked")
-    logger.info(f"Payload: {json.dumps(payload, default=str)[:500]}...")
+    logger.info(f"Payload: {_dumps(payload)[:500]}...")
 
     try:
         # Handle wrapped payload from Lambda (prompt field contains JSON string)
         if 'prompt' in payload and isinstance(payload['prompt'], str):
             try:
-                payload = json.loads(payload['prompt'])
+                payload = _loads(payload['prompt'])
                 logger.info(f"Unwrapped payload from prompt field: {payload}")
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 logger.warning("Failed to parse prompt as JSON, using as-is")
 
         # Extract action from payload
@@ -310,6 +737,10 @@ def invoke(payload: Dict, context: Any = None) -> Dict:
 
         if action == 'analyze':
             return handle_analyze_workflow(payload)
+        elif action == 'batch_analyze':
+            return handle_batch_analyze_workflow(payload)
+        elif action == 'batch_collect':
+            return handle_batch_collect_workflow(payload)
         elif action == 'monitor':
             return handle_monitor_workflow(payload)
         else:
@@ -340,42 +771,16 @@ def handle_analyze_workflow(payload: Dict) -> Dict:
     event_id = event.get('id')
 
     try:
-        # Step 1: Security Agent analyzes event
-        logger.info(f"Security Agent analyzing event {event_id}...")
+        # Step 1: Security Agent analyzes event (reuse cached analysis of the same pattern)
+        cache_key = event_signature(event)
+        analysis = analysis_cache.get(cache_key)
 
-        analysis_prompt = f"""You are a cybersecurity analyst. Analyze this WAF event and provide:
-1. severity_rating (0-5 integer)
-2. security_analysis (detailed threat analysis)
-3. recommended_actions (actionable recommendations)
-4. attack_type (classification)
-
-Severity scale:
-- 0: Not an issue
-- 1: Informational
-- 2: Low severity
-- 3: Medium severity (requires monitoring)
-- 4: High severity (requires escalation)
-- 5: Critical incident (requires immediate escalation)
-
-Event Data:
-{json.dumps(event, indent=2)}
-
-Return ONLY valid JSON with this structure:
-{{
-  "severity_rating": <0-5>,
-  "security_analysis": "<analysis>",
-  "recommended_actions": "<actions>",
-  "attack_type": "<type>"
-}}"""
-
-        security_result = security_agent(analysis_prompt)
-        response_text = security_result.message['content'][0]['text']
-
-        # Parse JSON from response
-        analysis = parse_json_response(response_text)
-
-        if not analysis or 'severity_rating' not in analysis:
-            raise ValueError("Security agent returned invalid analysis")
+        if analysis is not None:
+            logger.info(f"Analysis cache hit for event {event_id}")
+        else:
+            logger.info(f"Security Agent analyzing event {event_id}...")
+            analysis = run_security_analysis(_dumps(event, indent=True, sort_keys=True))
+            analysis_cache.set(cache_key, analysis)
 
         logger.info(f"Security analysis complete: severity={analysis['severity_rating']}")
 
@@ -385,29 +790,35 @@ Return ONLY valid JSON with this structure:
 
         logger.info(f"Triage decision: {triage['action_taken']}")
 
-        # Step 3: Execute backend actions via tools
+        # Step 3: Execute backend actions via tools (independent calls run concurrently)
         backend_actions = {}
 
-        # Update event analysis
-        update_result = update_event_analysis(
-            event_id=event_id,
-            severity=severity,
-            analysis=analysis.get('security_analysis', ''),
-            recommendations=analysis.get('recommended_actions', ''),
-            status=triage['status_update']
-        )
-        backend_actions['analysis_updated'] = 'Successfully' in update_result
-
-        # Create escalation if needed
-        if triage['escalate']:
-            escalation_result = create_escalation(
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # Update event analysis
+            update_future = executor.submit(
+                update_event_analysis,
                 event_id=event_id,
                 severity=severity,
-                title=f"{analysis.get('attack_type', 'Security Incident')} - Event {event_id}",
-                message=f"Event {event_id}: {analysis.get('security_analysis', '')}",
-                detail_payload=event
+                analysis=analysis.get('security_analysis', ''),
+                recommendations=analysis.get('recommended_actions', ''),
+                status=triage['status_update']
             )
-            backend_actions['escalation_created'] = 'Successfully' in escalation_result
+
+            # Create escalation if needed
+            escalation_future = None
+            if triage['escalate']:
+                escalation_future = executor.submit(
+                    create_escalation,
+                    event_id=event_id,
+                    severity=severity,
+                    title=f"{analysis.get('attack_type', 'Security Incident')} - Event {event_id}",
+                    message=f"Event {event_id}: {analysis.get('security_analysis', '')}",
+                    detail_payload=event
+                )
+
+            backend_actions['analysis_updated'] = 'Successfully' in update_future.result()
+            if escalation_future is not None:
+                backend_actions['escalation_created'] = 'Successfully' in escalation_future.result()
 
         # Step 4: Return structured response
         return {
@@ -428,10 +839,257 @@ Return ONLY valid JSON with this structure:
         }
 
 
+def run_security_analysis(event_json: str) -> Dict[str, Any]:
+    """
+    Run the Security Analyst agent on a single serialized event and return
+    the parsed analysis. Raises ValueError if the response is unusable.
+    """
+    analysis = stream_security_analysis(build_analysis_data(event_json))
+
+    severity = _coerce_severity(analysis.get('severity_rating'))
+    if severity is None:
+        raise ValueError("Security agent returned invalid analysis")
+    analysis['severity_rating'] = severity
+
+    return analysis
+
+
+def handle_batch_analyze_workflow(payload: Dict) -> Dict:
+    """
+    Workflow A (batch submit): Individual Event Analysis for a queue of events
+    Events → S3 JSONL → Bedrock Batch Inference job
+
+    Returns as soon as the job is started; pass the returned job_arn to the
+    batch_collect action once the job has finished. Small queues (or a
+    missing S3 bucket / service role) fall back to the per-event analyze
+    workflow.
+    """
+    logger.info("Starting batch analyze workflow")
+
+    events = [event for event in payload.get('events', []) if event.get('id') is not None]
+    if not events:
+        return {"status": "error", "workflow": "batch_analyze", "message": "No event data provided"}
+
+    if len(events) < BATCH_MIN_EVENTS or not BATCH_S3_BUCKET or not BATCH_ROLE_ARN:
+        logger.info(f"Analyzing {len(events)} events individually (batch threshold {BATCH_MIN_EVENTS})")
+        results = [handle_analyze_workflow({"event": event}) for event in events]
+        return {
+            "status": "success",
+            "workflow": "batch_analyze",
+            "mode": "per_event",
+            "events_submitted": len(events),
+            "results": results
+        }
+
+    try:
+        # Step 1: Write one model-input record per event to S3 and start the job
+        job_name = f"secops-batch-{uuid.uuid4().hex[:12]}"
+        job_prefix = f"{BATCH_S3_PREFIX}/{job_name}"
+        records = []
+        for event in events:
+            event_json = _dumps(event, indent=True, sort_keys=True)
+            records.append(_dumps({
+                "recordId": str(event['id']),
+                "modelInput": {
+                    "schemaVersion": "messages-v1",
+                    "system": [{"text": ANALYSIS_INSTRUCTIONS}],
+                    "messages": [{
+                        "role": "user",
+                        "content": [{"text": build_analysis_data(event_json)}]
+                    }]
+                }
+            }))
+
+        s3 = _aws_client('s3')
+        s3.put_object(
+            Bucket=BATCH_S3_BUCKET,
+            Key=f"{job_prefix}/input.jsonl",
+            Body="\n".join(records).encode()
+        )
+        # Keep the events next to the job so batch_collect can triage and escalate them
+        s3.put_object(
+            Bucket=BATCH_S3_BUCKET,
+            Key=f"{job_prefix}/events.json",
+            Body=_dumps(events).encode()
+        )
+
+        bedrock = _aws_client('bedrock')
+        job = bedrock.create_model_invocation_job(
+            jobName=job_name,
+            roleArn=BATCH_ROLE_ARN,
+            modelId=NOVA_MODEL_ID,
+            inputDataConfig={"s3InputDataConfig": {"s3Uri": f"s3://{BATCH_S3_BUCKET}/{job_prefix}/input.jsonl"}},
+            outputDataConfig={"s3OutputDataConfig": {"s3Uri": f"s3://{BATCH_S3_BUCKET}/{job_prefix}/output/"}}
+        )
+        job_arn = job['jobArn']
+        logger.info(f"Started batch inference job {job_arn} for {len(events)} events")
+
+        return {
+            "status": "submitted",
+            "workflow": "batch_analyze",
+            "mode": "batch",
+            "job_arn": job_arn,
+            "events_submitted": len(events)
+        }
+
+    except Exception as e:
+        logger.error(f"Error in batch analyze workflow: {str(e)}", exc_info=True)
+        return {
+            "status": "error",
+            "workflow": "batch_analyze",
+            "message": str(e)
+        }
+
+
+def _split_s3_uri(uri: str) -> Tuple[str, str]:
+    """Split s3://bucket/key into (bucket, key)."""
+    bucket, _, key = uri[len('s3://'):].partition('/')
+    return bucket, key
+
+
+def handle_batch_collect_workflow(payload: Dict) -> Dict:
+    """
+    Workflow A (batch collect): results of a submitted batch_analyze job
+    Batch Output (S3 JSONL) → Triage Agent → Grouped Backend Actions
+
+    Call once per job_arn after the job finishes (e.g. from a scheduled
+    poll or an EventBridge batch job state-change rule). A job that is
+    still running returns status "pending" and nothing is updated.
+    """
+    job_arn = payload.get('job_arn')
+    if not job_arn:
+        return {"status": "error", "workflow": "batch_collect", "message": "No job_arn provided"}
+
+    logger.info(f"Collecting batch inference job {job_arn}")
+
+    try:
+        # Step 1: Check the job state and locate its S3 prefix
+        job = _aws_client('bedrock').get_model_invocation_job(jobIdentifier=job_arn)
+        job_status = job['status']
+        if job_status not in BATCH_TERMINAL_STATES:
+            return {
+                "status": "pending",
+                "workflow": "batch_collect",
+                "job_arn": job_arn,
+                "job_status": job_status
+            }
+
+        logger.info(f"Batch job {job_arn} finished with status {job_status}")
+        if job_status not in ('Completed', 'PartiallyCompleted'):
+            return {
+                "status": "error",
+                "workflow": "batch_collect",
+                "job_arn": job_arn,
+                "message": f"Batch job ended with status {job_status}"
+            }
+
+        bucket, output_prefix = _split_s3_uri(job['outputDataConfig']['s3OutputDataConfig']['s3Uri'])
+        job_prefix = output_prefix.rstrip('/').rpartition('/')[0]
+
+        # Step 2: Load the events submitted with the job
+        s3 = _aws_client('s3')
+        events = _loads(s3.get_object(Bucket=bucket, Key=f"{job_prefix}/events.json")['Body'].read())
+
+        # Step 3: Read the output records and parse each analysis
+        events_by_id = {str(event['id']): event for event in events}
+        analyses = {}
+        listing = s3.list_objects_v2(Bucket=bucket, Prefix=output_prefix)
+        for obj in listing.get('Contents', []):
+            if not obj['Key'].endswith('.jsonl.out'):
+                continue
+            body = s3.get_object(Bucket=bucket, Key=obj['Key'])['Body'].read().decode()
+            for line in body.splitlines():
+                if not line.strip():
+                    continue
+                record = _loads(line)
+                try:
+                    response_text = record['modelOutput']['output']['message']['content'][0]['text']
+                except (KeyError, IndexError, TypeError):
+                    continue
+                analysis = parse_json_response(response_text)
+                severity = _coerce_severity(analysis.get('severity_rating'))
+                if severity is not None and record.get('recordId') in events_by_id:
+                    analysis['severity_rating'] = severity
+                    analyses[record['recordId']] = analysis
+
+        # Step 4: Triage and group identical outcomes into bulk updates
+        backend_actions = {
+            "total_events_updated": 0,
+            "escalations_created": 0
+        }
+        groups: Dict[tuple, List[int]] = {}
+        with ThreadPoolExecutor(max_workers=BACKEND_WORKERS) as executor:
+            escalation_futures = []
+            for record_id, analysis in analyses.items():
+                event = events_by_id[record_id]
+                severity = analysis['severity_rating']
+                triage = triage_decision(severity)
+                analysis_cache.set(event_signature(event), analysis)
+
+                group_key = (
+                    severity,
+                    triage['status_update'],
+                    analysis.get('security_analysis', ''),
+                    analysis.get('recommended_actions', '')
+                )
+                groups.setdefault(group_key, []).append(event['id'])
+
+                if triage['escalate']:
+                    escalation_futures.append(executor.submit(
+                        create_escalation,
+                        event_id=event['id'],
+                        severity=severity,
+                        title=f"{analysis.get('attack_type', 'Security Incident')} - Event {event['id']}",
+                        message=f"Event {event['id']}: {analysis.get('security_analysis', '')}",
+                        detail_payload=event
+                    ))
+
+            update_futures = {
+                executor.submit(
+                    bulk_update_events,
+                    event_ids=event_ids,
+                    severity=severity,
+                    analysis=analysis_text,
+                    recommendations=recommendations,
+                    status=status
+                ): event_ids
+                for (severity, status, analysis_text, recommendations), event_ids in groups.items()
+            }
+
+            for future in as_completed(escalation_futures):
+                if 'Successfully' in future.result():
+                    backend_actions['escalations_created'] += 1
+            for future in as_completed(update_futures):
+                if 'Successfully' in future.result():
+                    backend_actions['total_events_updated'] += len(update_futures[future])
+
+        failed_event_ids = [event['id'] for event in events if str(event['id']) not in analyses]
+        logger.info(f"Batch analysis complete: {len(analyses)} analyzed, {len(failed_event_ids)} failed")
+
+        return {
+            "status": "success",
+            "workflow": "batch_collect",
+            "job_arn": job_arn,
+            "events_submitted": len(events),
+            "events_analyzed": len(analyses),
+            "failed_event_ids": failed_event_ids,
+            "backend_actions_completed": backend_actions
+        }
+
+    except Exception as e:
+        logger.error(f"Error in batch collect workflow: {str(e)}", exc_info=True)
+        return {
+            "status": "error",
+            "workflow": "batch_collect",
+            "job_arn": job_arn,
+            "message": str(e)
+        }
+
+
 def handle_monitor_workflow(payload: Dict) -> Dict:
     """
     Workflow B: Daily Monitoring for Repeated Attacks
-    Monitoring Agent → Pattern Detection → Bulk Actions
+    Code Pre-Clustering + Monitoring Agent → Pattern Detection → Bulk Actions
     """
     logger.info("Starting monitor workflow (pattern detection)")
 
@@ -440,13 +1098,12 @@ def handle_monitor_workflow(payload: Dict) -> Dict:
     try:
         # Step 1: Get open events
         logger.info(f"Fetching open events from last {hours} hours...")
-        events_json = get_open_events(hours)
-        events_data = json.loads(events_json)
-
-        if 'error' in events_data:
-            return {"status": "error", "message": events_data['error']}
-
-        events = events_data if isinstance(events_data, list) else events_data.get('events', [])
+        try:
+            events = _get_open_events_raw(hours)
+        except Exception as e:
+            error_msg = f"Failed to fetch open events: {str(e)}"
+            logger.error(error_msg)
+            return {"status": "error", "message": error_msg}
 
         if not events:
             logger.info("No open events found")
@@ -459,102 +1116,103 @@ def handle_monitor_workflow(payload: Dict) -> Dict:
 
         logger.info(f"Found {len(events)} open events to analyze")
 
-        # Step 2: Monitoring Agent analyzes patterns
-        logger.info("Monitoring Agent analyzing patterns...")
-
-        monitoring_prompt = f"""You are a security monitoring specialist. Analyze these open WAF events to detect attack campaigns.
-
-Your task:
-1. Group events by attack patterns (same IP, same attack type, similar timeframe)
-2. Identify coordinated attacks
-3. For each campaign, provide:
-   - campaign_id (unique identifier like "sqli_192.168.1.100")
-   - attack_type (e.g., "SQL Injection", "XSS", "DDoS")
-   - affected_event_ids (list of event IDs in this campaign)
-   - severity_rating (4 or 5 for repeated attacks)
-   - security_analysis (describe the campaign)
-   - recommended_actions (actionable steps)
+        # Step 2: Code-based clustering of obvious campaigns (same IP + rule, tight timeframe)
+        campaigns, remaining_events = _precluster_events(events)
+        logger.info(f"Pre-clustered {len(campaigns)} campaign(s); {len(remaining_events)} events left for the Monitoring Agent")
 
-IMPORTANT: Only create campaigns for genuine repeated attacks. If events are unrelated, return empty campaigns list.
+        # Step 3: Monitoring Agent reviews a per-IP summary of the remaining, ambiguous events
+        ip_summaries, event_ids_by_ip = _aggregate_for_monitoring(remaining_events)
+        if ip_summaries:
+            logger.info(f"Monitoring Agent analyzing patterns across {len(ip_summaries)} source IPs...")
 
-Events ({len(events)} total):
-{json.dumps(events, indent=2)}
+            monitoring_input = f"""{DATA_SENTINEL}
+Source IPs ({len(ip_summaries)} total, {len(remaining_events)} events):
+{_dumps(ip_summaries)}"""
 
-Return ONLY valid JSON:
-{{
-  "campaigns": [
-    {{
-      "campaign_id": "<unique_id>",
-      "attack_type": "<type>",
-      "affected_event_ids": [101, 102, 103],
-      "severity_rating": <4 or 5>,
-      "security_analysis": "<analysis>",
-      "recommended_actions": "<actions>"
-    }}
-  ]
-}}"""
+            monitoring_result = _new_monitoring_agent()(monitoring_input)
+            response_text = monitoring_result.message['content'][0]['text']
 
-        monitoring_result = monitoring_agent(monitoring_prompt)
-        response_text = monitoring_result.message['content'][0]['text']
+            # Parse JSON from response
+            monitoring_data = parse_json_response(response_text)
 
-        # Parse JSON from response
-        monitoring_data = parse_json_response(response_text)
+            if not monitoring_data or 'campaigns' not in monitoring_data:
+                raise ValueError("Monitoring agent returned invalid response")
 
-        if not monitoring_data or 'campaigns' not in monitoring_data:
-            raise ValueError("Monitoring agent returned invalid response")
+            # Expand each campaign's source IPs back to every event from those IPs
+            for campaign in monitoring_data['campaigns']:
+                source_ips = campaign.get('source_ips') or []
+                if source_ips:
+                    campaign['affected_event_ids'] = [
+                        event_id for ip in source_ips for event_id in event_ids_by_ip.get(ip, [])
+                    ]
+                if campaign.get('affected_event_ids'):
+                    campaigns.append(campaign)
 
-        campaigns = monitoring_data['campaigns']
         logger.info(f"Detected {len(campaigns)} attack campaign(s)")
 
-        # Step 3: Process each campaign (bulk actions)
+        # Step 4: Process each campaign (bulk actions)
         backend_actions = {
             "total_events_updated": 0,
             "escalations_created": 0,
             "escalation_ids": []
         }
 
-        for campaign in campaigns:
-            campaign_id = campaign.get('campaign_id')
-            affected_event_ids = campaign.get('affected_event_ids', [])
-            severity = campaign.get('severity_rating', 4)
-
-            logger.info(f"Processing campaign {campaign_id} with {len(affected_event_ids)} events")
-
-            # Bulk update all events in campaign
-            bulk_result = bulk_update_events(
-                event_ids=affected_event_ids,
-                severity=severity,
-                analysis=campaign.get('security_analysis', ''),
-                recommendations=campaign.get('recommended_actions', ''),
-                status="investigating"
-            )
-
-            if 'Successfully' in bulk_result:
-                backend_actions['total_events_updated'] += len(affected_event_ids)
-
-            # Create ONE escalation for entire campaign
-            escalation_result = create_campaign_escalation(
-                title=f"{campaign.get('attack_type', 'Attack')} Campaign - {len(affected_event_ids)} Events",
-                message=f"Campaign {campaign_id}: {campaign.get('security_analysis', '')}",
-                severity=severity,
-                affected_event_ids=affected_event_ids,
-                detail_payload={
-                    "campaign_id": campaign_id,
-                    "attack_type": campaign.get('attack_type'),
-                    "event_count": len(affected_event_ids)
-                }
-            )
-
-            if 'Successfully' in escalation_result:
-                backend_actions['escalations_created'] += 1
-                # Extract escalation ID from result message
-                try:
-                    esc_id = int(escalation_result.split('escalation ')[1].split(' ')[0])
-                    backend_actions['escalation_ids'].append(esc_id)
-                except:
-                    pass
-
-        # Step 4: Return monitoring report
+        # Both backend writes for every campaign are independent - run them concurrently
+        with ThreadPoolExecutor(max_workers=BACKEND_WORKERS) as executor:
+            futures = {}
+            for campaign in campaigns:
+                campaign_id = campaign.get('campaign_id')
+                affected_event_ids = campaign.get('affected_event_ids', [])
+                severity = _coerce_severity(campaign.get('severity_rating', 4))
+                if severity is None:
+                    severity = 4
+
+                logger.info(f"Processing campaign {campaign_id} with {len(affected_event_ids)} events")
+
+                # Bulk update all events in campaign
+                bulk_future = executor.submit(
+                    bulk_update_events,
+                    event_ids=affected_event_ids,
+                    severity=severity,
+                    analysis=campaign.get('security_analysis', ''),
+                    recommendations=campaign.get('recommended_actions', ''),
+                    status="investigating"
+                )
+                futures[bulk_future] = ('bulk_update', affected_event_ids)
+
+                # Create ONE escalation for entire campaign
+                escalation_future = executor.submit(
+                    create_campaign_escalation,
+                    title=f"{campaign.get('attack_type', 'Attack')} Campaign - {len(affected_event_ids)} Events",
+                    message=f"Campaign {campaign_id}: {campaign.get('security_analysis', '')}",
+                    severity=severity,
+                    affected_event_ids=affected_event_ids,
+                    detail_payload={
+                        "campaign_id": campaign_id,
+                        "attack_type": campaign.get('attack_type'),
+                        "event_count": len(affected_event_ids)
+                    }
+                )
+                futures[escalation_future] = ('escalation', affected_event_ids)
+
+            for future in as_completed(futures):
+                kind, affected_event_ids = futures[future]
+                result = future.result()
+                if 'Successfully' not in result:
+                    continue
+
+                if kind == 'bulk_update':
+                    backend_actions['total_events_updated'] += len(affected_event_ids)
+                else:
+                    backend_actions['escalations_created'] += 1
+                    # Extract escalation ID from result message
+                    try:
+                        esc_id = int(result.split('escalation ')[1].split(' ')[0])
+                        backend_actions['escalation_ids'].append(esc_id)
+                    except:
+                        pass
+
+        # Step 5: Return monitoring report
         return {
             "status": "success",
             "workflow": "monitor",
@@ -571,25 +1229,36 @@ Return ONLY valid JSON:
         }
 
 
-def parse_json_response(response_text: str) -> Dict:
+def _strip_code_fence(text: str) -> str:
+    """
+    Return the body of the first markdown code block (```json or bare ```)
+    in a single partition pass, or the stripped text if there is none.
+    """
+    text = text.strip()
+    _, fence, rest = text.partition('```')
+    if not fence:
+        return text
+    body = rest.partition('```')[0]
+    if body.startswith('json'):
+        body = body[4:]
+    return body.strip()
+
+
+def parse_json_response(response_text: str) -> Dict[str, Any]:
     """
     Parse JSON from AI response, handling markdown code blocks and formatting.
     """
     try:
         # Remove markdown code blocks if present
-        text = response_text.strip()
-        if '```json' in text:
-            text = text.split('```json')[1].split('```')[0].strip()
-        elif '```' in text:
-            text = text.split('```')[1].split('```')[0].strip()
-
-        # Find JSON object in text
-        import re
-        json_match = re.search(r'\{[\s\S]*\}', text)
-        if json_match:
-            return json.loads(json_match.group())
+        text = _strip_code_fence(response_text)
+
+        # Find JSON object in text (outermost braces)
+        start = text.find('{')
+        end = text.rfind('}')
+        if start >= 0 and end > start:
+            return _loads(text[start:end + 1])
         else:
-            return json.loads(text)
+            return _loads(text)
     except Exception as e:
         logger.error(f"Failed to parse JSON response: {str(e)}")
         logger.error(f"Response text: {response_text[:500]}")
@@ -626,7 +1295,7 @@ if __name__ == "__main__":
     print("\n[TEST] Analyze Workflow")
     print("-" * 70)
     result = invoke(test_payload)
-    print(json.dumps(result, indent=2, default=str))
+    print(_dumps(result, indent=True))
 
     # Run the agent
     print("\n[INFO] Starting AgentCore app...")